@@ -7,38 +7,57 @@ BOM 데이터 처리 시스템 v2.0
 - 옵션 3: JSON vs 원본 엑셀 비교 검증
 """
 
+import numpy as np
 import pandas as pd
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import BarChart, PieChart, Reference
 import json
 import os
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, date
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
 import sys
 
 
+# Excel 서식 (모든 셀이 공유하는 단일 스타일 객체, 색상은 8자리 ARGB - 6자리는 투명으로 처리됨)
+HEADER_FILL = PatternFill(start_color="FF4472C4", end_color="FF4472C4", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFFFF")
+THIN_SIDE = Side(style='thin')
+THIN_BORDER = Border(left=THIN_SIDE, right=THIN_SIDE, top=THIN_SIDE, bottom=THIN_SIDE)
+CENTER = Alignment(horizontal='center', vertical='center')
+
+
 class BOMProcessor:
     """BOM 데이터 처리 메인 클래스"""
 
+    # 컬럼 순서 정의 (사용자 지정)
+    column_order = [
+        'WELD UNIQUE ID', 'BLOCK', 'FILENAME', 'DWG. Title', 'MOD. NO', 'DETAIL VIEW',
+        'MATNO', 'STEEL NO', 'NESTING DWG', 'Grade',
+        'OFF', 'WLEG', 'WELD. LENG.', 'SIDE', 'WNO', 'P. NO',
+        'ea', 'total', 'T', 'B', 'L(OD)', 'WEIGHT', 'MIX', 'no',
+        'TPYE', 'WORKSCOPE', 'REV1'
+    ]
+
+    # 제외할 컬럼 (MATNO1~MATNO6는 WELD ID 파싱용 임시 데이터이므로 결과에서 제거)
+    exclude_columns = ['MATNO1', 'MATNO2', 'MATNO3', 'MATNO4', 'MATNO5', 'MATNO6', 'MOD', '_matched']
+
     def __init__(self):
         self.weld_file = None
         self.detail_file = None
         self.result_df = None
+        self._excel_cache = {}  # 파일 경로 -> 전체 DataFrame (한 번만 파싱)
+        self._last_export = None  # 옵션 2 결과 (파일명, 시트명 -> DataFrame), 옵션 3 검증에 재사용
         self.group_columns = ['MATNO', 'STEEL NO', 'NESTING DWG', 'Grade', 'T']
 
-        # 컬럼 순서 정의 (사용자 지정)
-        self.column_order = [
-            'WELD UNIQUE ID', 'BLOCK', 'FILENAME', 'DWG. Title', 'MOD. NO', 'DETAIL VIEW',
-            'MATNO', 'STEEL NO', 'NESTING DWG', 'Grade',
-            'OFF', 'WLEG', 'WELD. LENG.', 'SIDE', 'WNO', 'P. NO',
-            'ea', 'total', 'T', 'B', 'L(OD)', 'WEIGHT', 'MIX', 'no',
-            'TPYE', 'WORKSCOPE', 'REV1'
-        ]
-
-        # 제외할 컬럼 (MATNO1~MATNO6는 WELD ID 파싱용 임시 데이터이므로 결과에서 제거)
-        self.exclude_columns = ['MATNO1', 'MATNO2', 'MATNO3', 'MATNO4', 'MATNO5', 'MATNO6', 'MOD', '_matched']
+        # 루트 디렉토리 (!!bom 폴더) 및 JSON 출력 디렉토리 - 한 번만 계산
+        self._base_dir = Path(__file__).resolve().parent
+        self._json_dir = self._base_dir / 'json'
+        self._json_dir.mkdir(exist_ok=True)
 
         # Windows 콘솔 인코딩 설정
         if sys.platform == 'win32':
@@ -47,25 +66,53 @@ class BOMProcessor:
             except:
                 pass
 
-    def detect_weld_file(self, df):
-        """WELD 파일 자동 감지"""
-        columns = df.columns.tolist()
-        has_weld_id = any('WELD' in str(col).upper() and 'UNIQUE' in str(col).upper() for col in columns)
-        matno_cols = [col for col in columns if 'MATNO' in str(col).upper() and any(c.isdigit() for c in str(col))]
-        return has_weld_id and len(matno_cols) >= 2
+    def detect_weld_file(self, columns):
+        """WELD 파일 자동 감지 (헤더 목록 기준)"""
+        upper = pd.Index(columns).astype(str).str.upper()
+        has_weld_id = bool((upper.str.contains('WELD', regex=False) & upper.str.contains('UNIQUE', regex=False)).any())
+        matno_count = int((upper.str.contains('MATNO', regex=False) & upper.str.contains(r'\d')).sum())
+        return has_weld_id and matno_count >= 2
 
     def find_excel_files(self, directory='data'):
         """데이터 디렉토리에서 Excel 파일 찾기 (기존 logic 보완)"""
         excel_files = []
-        data_dir = Path(__file__).parent / directory
+        data_dir = self._base_dir / directory
         if not data_dir.exists():
             print(f"[WARN] {directory} 디렉토리가 없습니다. 현재 디렉토리에서 검색합니다.")
             data_dir = Path('.')
-            
-        for ext in ['*.xlsx', '*.xls']:
-            excel_files.extend(data_dir.glob(ext))
-        # weld_export.xlsx 및 임시 파일(~$...) 제외
-        return [str(f) for f in excel_files if 'weld_export' not in str(f).lower() and not str(f.name).startswith('~$')]
+
+        # 디렉토리는 한 번만 순회 (확장자/이름 필터를 같은 루프에서 처리)
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                # 숨김 파일 및 임시 파일(~$...) 제외
+                if name.startswith(('~$', '.')) or not entry.is_file():
+                    continue
+                lower = name.lower()
+                # weld_export.xlsx 제외
+                if not lower.endswith(('.xlsx', '.xls')) or 'weld_export' in lower:
+                    continue
+                excel_files.append(entry.path)
+        return excel_files
+
+    def read_headers(self, file):
+        """첫 행(헤더)만 읽기 - read_only 모드로 시트 전체를 파싱하지 않음"""
+        if str(file).lower().endswith('.xls'):
+            return pd.read_excel(file, nrows=0).columns.tolist()
+
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]  # pd.read_excel 기본값과 동일하게 첫 번째 시트
+            headers = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+        return [h for h in headers if h is not None]
+
+    def read_data(self, file):
+        """Excel 전체 읽기 (같은 파일은 다시 파싱하지 않고 캐시 사용)"""
+        if file not in self._excel_cache:
+            self._excel_cache[file] = pd.read_excel(file, keep_default_na=False)
+        return self._excel_cache[file]
 
     def load_files(self):
         """파일 자동 로드"""
@@ -89,11 +136,11 @@ class BOMProcessor:
         for file in priority_files:
             try:
                 # 헤더만 읽어서 파일 유형 판단 (속도 최적화)
-                df_head = pd.read_excel(file, nrows=0)
-                if self.detect_weld_file(df_head) and not self.weld_file:
+                headers = self.read_headers(file)
+                if self.detect_weld_file(headers) and not self.weld_file:
                     self.weld_file = file
                     print(f"\n[OK] WELD 파일 (감지됨): {os.path.basename(file)}")
-                elif 'MATNO' in [str(c).upper() for c in df_head.columns] and not self.detail_file:
+                elif 'MATNO' in [str(c).upper() for c in headers] and not self.detail_file:
                     self.detail_file = file
                     print(f"[OK] 상세 파일 (감지됨): {os.path.basename(file)}")
             except Exception as e:
@@ -112,8 +159,8 @@ class BOMProcessor:
         print("데이터 매칭 시작...")
         print("=" * 60)
 
-        weld_df = pd.read_excel(self.weld_file, keep_default_na=False)
-        detail_df = pd.read_excel(self.detail_file, keep_default_na=False)
+        weld_df = self.read_data(self.weld_file)
+        detail_df = self.read_data(self.detail_file)
 
         print(f"[OK] WELD 데이터: {len(weld_df)}행")
         print(f"[OK] 상세 데이터: {len(detail_df)}행")
@@ -138,32 +185,34 @@ class BOMProcessor:
         print(f"[OK] MATNO 컬럼: {len(matno_columns)}개")
         print(f"[OK] Detail MATNO: {detail_matno_col}")
 
-        # 매칭 수행
-        results = []
-        matched = 0
-        missing = 0
-
-        for idx, weld_row in weld_df.iterrows():
-            for matno_col in matno_columns:
-                matno = weld_row[matno_col]
-
-                if matno and str(matno).strip():
-                    matched_detail = detail_df[detail_df[detail_matno_col] == matno]
-
-                    if not matched_detail.empty:
-                        detail_row = matched_detail.iloc[0]
-                        result_row = {**weld_row.to_dict(), **detail_row.to_dict()}
-                        result_row['_matched'] = True
-                        results.append(result_row)
-                        matched += 1
-                    else:
-                        result_row = weld_row.to_dict()
-                        result_row[detail_matno_col] = matno
-                        result_row['_matched'] = False
-                        results.append(result_row)
-                        missing += 1
-
-        self.result_df = pd.DataFrame(results)
+        # 매칭 수행 (WELD 행 x MATNO 컬럼을 세로로 펼친 뒤 한 번의 join으로 결합)
+        # 행 우선(row-major) 펼침: WELD 행 순서 -> MATNO1, MATNO2, ... 순서 유지
+        keys = pd.Series(weld_df[matno_columns].to_numpy(dtype=object).ravel())
+        row_pos = np.repeat(np.arange(len(weld_df)), len(matno_columns))
+        valid = (keys.ne(0) & keys.notna() & keys.astype(str).str.strip().ne('')).to_numpy()
+        weld_long = weld_df.take(row_pos[valid]).reset_index(drop=True)
+        matno_keys = pd.Series(keys[valid].to_numpy())
+
+        # 상세 데이터를 MATNO 인덱스로 한 번만 색인 (MATNO별 첫 행 사용) 후 각 키의 상세 행 위치 조회
+        detail_first = detail_df.drop_duplicates(subset=detail_matno_col, keep='first').reset_index(drop=True)
+        detail_pos = pd.Index(detail_first[detail_matno_col]).get_indexer(matno_keys)
+        is_matched = pd.Series(detail_pos >= 0)
+
+        # 결과는 컬럼별 배열로 바로 구성 (겹치는 컬럼은 상세 값 우선, 매칭 실패 행은 WELD 값과 원래 MATNO 유지)
+        # 컬럼 순서: WELD 컬럼 -> 상세 전용 컬럼 -> _matched
+        result = {col: weld_long[col] for col in weld_df.columns}
+        for col in detail_df.columns:
+            detail_values = detail_first[col].reindex(detail_pos).reset_index(drop=True)
+            if col == detail_matno_col:
+                fallback = matno_keys
+            else:
+                fallback = result.get(col)
+            result[col] = detail_values.where(is_matched, fallback)
+        result['_matched'] = is_matched
+        self.result_df = pd.DataFrame(result)
+
+        matched = int(is_matched.sum())
+        missing = len(self.result_df) - matched
 
         print(f"\n[OK] 매칭 성공: {matched:,}개")
         print(f"[WARN] 매칭 실패: {missing:,}개")
@@ -172,39 +221,92 @@ class BOMProcessor:
         return True
 
     def clean_data(self, df):
-        """excel-master 패턴을 적용한 고성능 데이터 정제"""
-        import numpy as np
-        from datetime import datetime, date
-
+        """excel-master 패턴을 적용한 고성능 데이터 정제 (컬럼 dtype별 벡터 연산)"""
         # 1. 빈 행/열 제거
         df = df.dropna(how='all').dropna(axis=1, how='all')
-        
+
         # 2. 중복 헤더/컬럼 처리
         df = df.loc[:, ~df.columns.duplicated()]
 
-        # 3. 공백 제거 및 NaN 처리
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-        df = df.fillna('')
-
-        # 4. 타입 변환 및 포맷팅 (NP/Datetime -> String)
+        # 3~4. 공백 제거, NaN 처리, 타입 변환 및 포맷팅 (NP/Datetime -> String)
         for col in df.columns:
-            df[col] = df[col].apply(lambda x:
-                '' if (str(x).lower() == 'nan' or pd.isna(x))
-                else (x.isoformat() if isinstance(x, (datetime, date, pd.Timestamp))
-                else int(x) if isinstance(x, (np.int64, float)) and x == int(x) # 정수형 실수 처리
-                else str(x) if isinstance(x, (np.int64, np.float64, float))
-                else x)
-            )
+            df[col] = self._clean_column(df[col])
 
         # 5. WNO 컬럼을 3자리 숫자로 포맷팅 (001, 002, ...)
         if 'WNO' in df.columns:
-            df['WNO'] = df['WNO'].apply(lambda x:
-                f"{int(float(x)):03d}" if (str(x).strip() and str(x).replace('.', '').replace('-', '').isdigit())
-                else x
-            )
+            wno = df['WNO'].astype(str).str.strip()
+            is_number = wno.str.match(r'^-?\d+(?:\.\d+)?$')
+            numbers = np.trunc(pd.to_numeric(wno.where(is_number)).astype(float))
+            # int64 범위를 넘는 값은 변환하지 않고 원래 값 유지
+            is_number &= numbers.abs().lt(2 ** 63)
+            formatted = numbers.where(is_number).astype('Int64').astype(str).str.zfill(3)
+            df['WNO'] = formatted.where(is_number, df['WNO'])
 
         return df.infer_objects()
 
+    def _clean_column(self, s):
+        """컬럼 하나를 dtype에 맞는 벡터 연산으로 정제"""
+        if pd.api.types.is_bool_dtype(s) or pd.api.types.is_integer_dtype(s):
+            return s
+        if pd.api.types.is_datetime64_any_dtype(s):
+            return self._format_datetimes(s)
+        if pd.api.types.is_numeric_dtype(s):
+            return self._format_numbers(s)
+
+        # 문자열/혼합 컬럼: 문자열 값만 strip ('nan' 문자열은 빈 값 처리)
+        if pd.api.types.infer_dtype(s, skipna=True) in ('string', 'empty', 'mixed', 'mixed-integer'):
+            stripped = s.str.strip()
+            stripped = stripped.mask(stripped.str.lower() == 'nan', '')
+        else:
+            stripped = pd.Series(None, index=s.index, dtype=object)
+
+        # 문자열이 아닌 값(숫자, 날짜 등)은 원래 값을 타입별로 포맷
+        others = stripped.isna() & s.notna()
+        if not others.any():
+            return stripped.fillna('')
+
+        rest = s[others]
+        result = stripped.astype(object)
+        types = rest.map(type)
+        # np.int64는 float64를 거치면 2**53 이상에서 정밀도가 깨지므로 int로 직접 변환
+        ints = types.eq(np.int64)
+        if ints.any():
+            result[ints[ints].index] = rest[ints].map(int)
+        floats = types.isin([float, np.float64])
+        if floats.any():
+            result[floats[floats].index] = self._format_numbers(rest[floats].astype('float64'))
+        dates = rest[~(ints | floats)].map(lambda x: isinstance(x, (datetime, date, pd.Timestamp)))
+        if dates.any():
+            result[dates[dates].index] = rest[dates[dates].index].map(lambda x: x.isoformat())
+        leftover = others & result.isna()
+        result[leftover] = s[leftover]
+        return result.fillna('')
+
+    def _format_numbers(self, s):
+        """실수 컬럼 포맷: 정수형 실수 -> int, 나머지 -> str, NaN -> ''"""
+        values = s.to_numpy(dtype='float64')
+        finite = np.isfinite(values)
+        integral = finite & (values == np.trunc(np.where(finite, values, 0)))
+        # int64 범위를 넘는 정수형 실수는 int64로 변환하면 값이 깨지므로 파이썬 int로 변환
+        big = integral & ~(np.abs(np.where(finite, values, 0)) < 2 ** 63)
+        integral &= ~big
+        result = pd.Series(s.astype(str).to_numpy(dtype=object), index=s.index, dtype=object)
+        result[integral] = values[integral].astype('int64')
+        if big.any():
+            result[big] = [int(v) for v in values[big]]
+        result[np.isnan(values)] = ''
+        if integral.all():
+            return result.astype('int64')
+        return result
+
+    def _format_datetimes(self, s):
+        """날짜 컬럼 포맷: ISO 8601 문자열, NaT -> ''"""
+        formatted = s.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        has_fraction = s.dt.microsecond.fillna(0).ne(0)
+        if has_fraction.any():
+            formatted[has_fraction] = s[has_fraction].dt.strftime('%Y-%m-%dT%H:%M:%S.%f')
+        return formatted.fillna('')
+
     def reorder_columns(self, df):
         """컬럼을 지정된 순서로 재정렬 및 불필요한 컬럼 제거"""
         # 현재 데이터프레임의 컬럼
@@ -234,29 +336,28 @@ class BOMProcessor:
         print("옵션 1: JSON 파일 생성")
         print("=" * 60)
 
-        # 루트 디렉토리 (!!bom 폴더)
-        parent_dir = Path(__file__).parent
+        parent_dir = self._base_dir
+        json_dir = self._json_dir
 
         clean_df = self.result_df.drop(columns=['_matched'], errors='ignore')
         clean_df = self.clean_data(clean_df)
         clean_df = self.reorder_columns(clean_df)  # 컬럼 순서 정렬
 
-        # JSON 디렉토리 생성
-        json_dir = parent_dir / 'json'
-        json_dir.mkdir(exist_ok=True)
+        # JSON 직렬화는 한 번만 수행 (pandas C 직렬화기, 행별 dict 생성 없음) 후 두 파일에 재사용
+        json_text = clean_df.to_json(orient='records', force_ascii=False)
 
         # all_data.json 생성 (검증용)
-        clean_df.to_json(json_dir / 'all_data.json', orient='records', force_ascii=False, indent=2)
+        with open(json_dir / 'all_data.json', 'w', encoding='utf-8') as f:
+            f.write(json_text)
 
         # 그룹별 JSON 생성 제거 (필요없으므로 생략)
 
         # JavaScript 파일 (all_data.js) 생성
         print("\n[OK] all_data.js 파일 생성 중...")
-        all_data = clean_df.to_dict(orient='records')
         with open(parent_dir / 'all_data.js', 'w', encoding='utf-8') as f:
             f.write('// Auto-generated from bom.py\n')
             f.write('window.ALL_DATA = ')
-            json.dump(all_data, f, ensure_ascii=False)
+            f.write(json_text)
             f.write(';\n')
         print(f"[OK] JavaScript 파일: {parent_dir / 'all_data.js'}")
 
@@ -278,171 +379,144 @@ class BOMProcessor:
         clean_df = self.clean_data(clean_df)
         clean_df = self.reorder_columns(clean_df)  # 컬럼 순서 정렬
 
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            # 전체 데이터 시트
-            clean_df.to_excel(writer, sheet_name='전체', index=False)
-            print(f"[OK] 전체 시트: {len(clean_df):,}행")
-            
-            # workbook 가져오기
-            wb = writer.book
-            ws_all = wb['전체']
-            
-            # 헤더 인덱스 매핑
-            all_cols = {cell.value: get_column_letter(cell.column) for cell in ws_all[1]}
-
-            # 그룹별 시트 생성 (공식 연동)
-            for group_col in self.group_columns:
-                if group_col not in clean_df.columns:
-                    continue
-
-                # 해당 그룹 컬럼의 데이터만 필터링 하여 정렬된 인덱스 확보
-                filtered_indices = clean_df[clean_df[group_col].astype(str).str.strip() != ''].index.tolist()
-                
-                # 병합 및 정렬 기준 (속도 위해 DataFrame 정렬 사용)
-                sort_cols = [group_col]
-                for sc in self.group_columns:
-                    if sc in clean_df.columns and sc != group_col:
-                        sort_cols.append(sc)
-                
-                # 정렬된 인덱스 순서 추출
-                sorted_df = clean_df.loc[filtered_indices].sort_values(by=sort_cols)
-                sorted_indices = sorted_df.index.tolist()
-
-                sheet_name = group_col.replace(' ', '_').replace('/', '_')[:31]
-                ws_group = wb.create_sheet(sheet_name)
-                
-                # 헤더 복사
-                for c_idx, col_name in enumerate(clean_df.columns, 1):
-                    ws_group.cell(row=1, column=c_idx, value=col_name)
-
-                # 데이터 연동 (Excel 공식 사용: =전체!A2)
-                for r_idx, original_idx in enumerate(sorted_indices, 2):
-                    excel_row_num = original_idx + 2 # pandas index 0 -> excel row 2
-                    for c_idx, col_name in enumerate(clean_df.columns, 1):
-                        col_letter = get_column_letter(c_idx)
-                        # 중요: 모든 셀을 '전체' 시트의 해당 행/열로 연동
-                        formula = f"='전체'!{col_letter}{excel_row_num}"
-                        ws_group.cell(row=r_idx, column=c_idx, value=formula)
-
-                print(f"[OK] {group_col} 시트: {len(sorted_indices):,}행 (공식 연동 완려)")
-
-        # 서식 및 차트 적용
-        self.apply_formatting_and_charts(filename, clean_df)
-        print(f"\n[SUCCESS] 옵션 2 완료: {filename}")
-
-    def apply_formatting_and_charts(self, filename, df):
-        """Excel 서식 및 차트 적용"""
-        print("\n[OK] 서식 및 차트 적용 중...")
-        wb = openpyxl.load_workbook(filename)
-
-        # 헤더 스타일
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-
-            # 헤더 서식
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = thin_border
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            # 데이터 테두리
-            for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-                for cell in row:
-                    cell.border = thin_border
-
-            # 열 너비 자동 조정
-            for column in ws.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-
-                for cell in column:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
-
-                ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
-
-            # 자동 필터 추가 (모든 시트)
-            if ws.max_row > 1:
-                ws.auto_filter.ref = ws.dimensions
-                print(f"[OK] {sheet_name} 시트에 자동 필터 추가")
-
-            # 차트 추가 (전체 시트에만)
-            if sheet_name == '전체' and ws.max_row > 1:
-                self.add_charts_to_sheet(ws, df)
+        # write-only 모드: 행 단위 스트리밍 저장 (서식/차트까지 한 번에 기록, 재로딩 없음)
+        wb = openpyxl.Workbook(write_only=True)
+
+        # 열 너비는 DataFrame 문자열 길이에서 한 번만 계산하여 모든 시트에 적용 (헤더 포함, 최대 50)
+        data_lengths = clean_df.astype(str).apply(lambda s: s.str.len()).max().fillna(0).to_numpy()
+        header_lengths = clean_df.columns.astype(str).str.len().to_numpy()
+        col_widths = (np.maximum(data_lengths, header_lengths) + 2).clip(max=50).astype(int).tolist()
+
+        # 전체 데이터 시트
+        export_sheets = {'전체': clean_df}
+        ws_all = wb.create_sheet('전체')
+        self.write_formatted_sheet(ws_all, clean_df.columns, clean_df.itertuples(index=False, name=None),
+                                   len(clean_df), col_widths)
+        print(f"[OK] 전체 시트: {len(clean_df):,}행")
+
+        # 그룹별 정렬/필터는 서로 독립이므로 스레드 풀에서 준비 (NumPy/pandas 연산은 GIL 해제)
+        # openpyxl 쓰기는 스레드 안전하지 않으므로 시트 기록은 메인 스레드에서 순서대로 수행
+        group_cols = [c for c in self.group_columns if c in clean_df.columns]
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(group_cols)))) as executor:
+            # 그룹 컬럼별 정렬 코드(factorize)와 비어있지 않은 행 마스크는 한 번만 계산하여 재사용
+            sort_codes = dict(zip(group_cols, executor.map(
+                lambda c: pd.factorize(clean_df[c], sort=True)[0], group_cols)))
+            non_empty = dict(zip(group_cols, executor.map(
+                lambda c: (clean_df[c].astype(str).str.strip() != '').to_numpy(), group_cols)))
+            prepared = list(executor.map(
+                lambda gc: self.prepare_group_sheet(clean_df, gc, group_cols, sort_codes, non_empty), group_cols))
+
+        # 그룹별 시트 생성 (정렬된 값 복사)
+        for group_col, sorted_df in zip(group_cols, prepared):
+            sheet_name = group_col.replace(' ', '_').replace('/', '_')[:31]
+            ws_group = wb.create_sheet(sheet_name)
+            export_sheets[sheet_name] = sorted_df
+
+            # 값 직접 기록 (공식 연동 시 openpyxl로 다시 읽으면 계산값이 없음)
+            self.write_formatted_sheet(ws_group, clean_df.columns, sorted_df.itertuples(index=False, name=None),
+                                       len(sorted_df), col_widths)
+
+            print(f"[OK] {group_col} 시트: {len(sorted_df):,}행 (값 복사 완료)")
+
+        # 차트 원본 데이터는 숨김 시트(_charts)에 행 단위로 기록, 차트는 전체 시트 데이터 우측에 배치
+        chart_tables = self.build_chart_tables(clean_df)
+        if chart_tables:
+            ws_chart_data = wb.create_sheet('_charts')
+            ws_chart_data.sheet_state = 'hidden'
+            for table_rows in zip_longest(*[table for _, table in chart_tables], fillvalue=(None, None)):
+                ws_chart_data.append([v for pair in table_rows for v in (*pair, None)])
+            self.add_charts_to_sheet(ws_all, ws_chart_data, chart_tables, len(clean_df.columns) + 5)
 
         wb.save(filename)
-        print("[OK] 서식 및 차트 적용 완료")
+        self._last_export = {'filename': filename, 'sheets': export_sheets}
+        print(f"\n[SUCCESS] 옵션 2 완료: {filename}")
 
-    def add_charts_to_sheet(self, ws, df):
-        """시트에 차트 추가"""
+    def prepare_group_sheet(self, clean_df, group_col, group_cols, sort_codes, non_empty):
+        """그룹 시트용 데이터 준비: 그룹 컬럼이 비어있지 않은 행을 그룹 컬럼 우선으로 정렬"""
+        # 해당 그룹 컬럼이 비어있지 않은 행 위치
+        rows = np.flatnonzero(non_empty[group_col])
+
+        # 병합 및 정렬 기준: 그룹 컬럼 우선, 나머지 그룹 컬럼 순 (np.lexsort는 마지막 키가 1순위, 안정 정렬)
+        sort_cols = [group_col] + [sc for sc in group_cols if sc != group_col]
+        order = np.lexsort([sort_codes[sc][rows] for sc in reversed(sort_cols)])
+        return clean_df.iloc[rows[order]]
+
+    def write_formatted_sheet(self, ws, columns, rows, row_count, col_widths):
+        """write-only 시트에 헤더/테두리 서식, 열 너비, 자동 필터를 적용하며 행 기록"""
+        # 열 너비는 첫 행 기록 전에 지정해야 함 (write-only 제약)
+        for c_idx, width in enumerate(col_widths, 1):
+            ws.column_dimensions[get_column_letter(c_idx)].width = width
+
+        header_row = []
+        for col_name in columns:
+            cell = WriteOnlyCell(ws, value=col_name)
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.border = THIN_BORDER
+            cell.alignment = CENTER
+            header_row.append(cell)
+        ws.append(header_row)
+
+        for row in rows:
+            data_row = []
+            for value in row:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.border = THIN_BORDER
+                data_row.append(cell)
+            ws.append(data_row)
+
+        # 자동 필터 추가 (데이터 영역만)
+        if row_count > 0:
+            ws.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{row_count + 1}"
+            print(f"[OK] {ws.title} 시트에 자동 필터 추가")
+
+    def build_chart_tables(self, df):
+        """차트 원본 데이터 (Grade 분포, MATNO별 WEIGHT 합계) 계산"""
+        tables = []
         try:
-            # Grade 분포 차트 (Pie Chart)
+            # Grade 분포 (Pie Chart)
             if 'Grade' in df.columns:
-                grade_counts = df['Grade'].value_counts().head(10)
-
-                # 데이터 시트 우측에 임시 데이터 추가
-                start_col = ws.max_column + 2
-                ws.cell(row=1, column=start_col, value="Grade")
-                ws.cell(row=1, column=start_col+1, value="Count")
-
-                for idx, (grade, count) in enumerate(grade_counts.items(), start=2):
-                    ws.cell(row=idx, column=start_col, value=str(grade))
-                    ws.cell(row=idx, column=start_col+1, value=count)
-
-                # Pie Chart 생성
-                pie = PieChart()
-                pie.title = "Grade 분포 (Top 10)"
-                labels = Reference(ws, min_col=start_col, min_row=2, max_row=len(grade_counts)+1)
-                data = Reference(ws, min_col=start_col+1, min_row=1, max_row=len(grade_counts)+1)
-                pie.add_data(data, titles_from_data=True)
-                pie.set_categories(labels)
-                pie.height = 10
-                pie.width = 15
-
-                ws.add_chart(pie, f"{get_column_letter(start_col+3)}2")
+                grade_counts = df['Grade'].value_counts(sort=False).nlargest(10)
+                tables.append(('Grade', [("Grade", "Count")] +
+                               [(str(grade), count) for grade, count in grade_counts.items()]))
 
             # WEIGHT 합계 (Bar Chart)
             if 'WEIGHT' in df.columns and 'MATNO' in df.columns:
-                weight_by_matno = df.groupby('MATNO')['WEIGHT'].sum().sort_values(ascending=False).head(10)
-
-                start_col = ws.max_column + 2
-                ws.cell(row=1, column=start_col, value="MATNO")
-                ws.cell(row=1, column=start_col+1, value="Total Weight")
+                # clean_data 이후 WEIGHT는 문자열/정수 혼합이므로 숫자로 변환 후 합계 (Top 10만 부분 정렬)
+                weight = pd.to_numeric(df['WEIGHT'], errors='coerce').fillna(0)
+                weight_by_matno = weight.groupby(df['MATNO']).sum().nlargest(10)
+                tables.append(('WEIGHT', [("MATNO", "Total Weight")] +
+                               [(str(matno), float(weight)) for matno, weight in weight_by_matno.items()]))
 
-                for idx, (matno, weight) in enumerate(weight_by_matno.items(), start=2):
-                    ws.cell(row=idx, column=start_col, value=str(matno))
-                    ws.cell(row=idx, column=start_col+1, value=float(weight))
+        except Exception as e:
+            print(f"[WARN] 차트 생성 중 오류: {e}")
+        return tables
 
+    def add_charts_to_sheet(self, ws, data_ws, chart_tables, anchor_col):
+        """시트에 차트 추가 (원본 데이터는 data_ws의 A열부터 3열 간격으로 기록되어 있음)"""
+        for i, (chart_type, table) in enumerate(chart_tables):
+            col = 1 + i * 3
+            if chart_type == 'Grade':
+                # Pie Chart 생성
+                chart = PieChart()
+                chart.title = "Grade 분포 (Top 10)"
+                anchor_row = 2
+            else:
                 # Bar Chart 생성
-                bar = BarChart()
-                bar.title = "MATNO별 WEIGHT 합계 (Top 10)"
-                bar.x_axis.title = "MATNO"
-                bar.y_axis.title = "Weight"
-
-                data = Reference(ws, min_col=start_col+1, min_row=1, max_row=len(weight_by_matno)+1)
-                cats = Reference(ws, min_col=start_col, min_row=2, max_row=len(weight_by_matno)+1)
-                bar.add_data(data, titles_from_data=True)
-                bar.set_categories(cats)
-                bar.height = 10
-                bar.width = 15
+                chart = BarChart()
+                chart.title = "MATNO별 WEIGHT 합계 (Top 10)"
+                chart.x_axis.title = "MATNO"
+                chart.y_axis.title = "Weight"
+                anchor_row = 20
 
-                ws.add_chart(bar, f"{get_column_letter(start_col+3)}20")
+            data = Reference(data_ws, min_col=col+1, min_row=1, max_row=len(table))
+            labels = Reference(data_ws, min_col=col, min_row=2, max_row=len(table))
+            chart.add_data(data, titles_from_data=True)
+            chart.set_categories(labels)
+            chart.height = 10
+            chart.width = 15
 
-        except Exception as e:
-            print(f"[WARN] 차트 생성 중 오류: {e}")
+            ws.add_chart(chart, f"{get_column_letter(anchor_col + i * 3)}{anchor_row}")
 
     # =====================================================================
     # 옵션 3: JSON vs 원본 비교 검증
@@ -472,16 +546,6 @@ class BOMProcessor:
 
         target_excel = export_files[0]
         print(f"[OK] 검증 대상 엑셀: {target_excel.name}")
-        
-        wb = openpyxl.load_workbook(target_excel, data_only=True) # 공식 결과값으로 읽기
-        ws_all = wb['전체']
-        
-        # '전체' 시트 데이터를 DataFrame으로 변환
-        all_data = []
-        headers = [cell.value for cell in ws_all[1]]
-        for row in ws_all.iter_rows(min_row=2, values_only=True):
-            all_data.append(dict(zip(headers, row)))
-        df_all = pd.DataFrame(all_data)
 
         results = {
             'timestamp': datetime.now().isoformat(),
@@ -489,82 +553,72 @@ class BOMProcessor:
             'cross_sheet_validation': {}
         }
 
-        # 3. 그룹 시트 무결성 검증 (MATNO / WELD ID 기준)
+        if self._last_export and Path(self._last_export['filename']).name == target_excel.name:
+            # 이번 실행에서 옵션 2가 만든 파일이면 파일을 다시 읽지 않고 메모리의 시트 데이터로 검증
+            print("[OK] 옵션 2 결과(메모리)로 검증합니다.")
+            sheets = self._last_export['sheets']
+            results['cross_sheet_validation'] = self.validate_group_sheets(
+                sheets['전체'], ((name, df) for name, df in sheets.items() if name != '전체'))
+        else:
+            # 워크북은 한 번만 열고 시트 목록만 확인한 뒤, 그룹 시트는 하나씩 읽어 비교 (차트용 '_' 시트 제외)
+            # (문자열로 통일하여 10 vs 10.0 같은 타입 차이 제거)
+            read_opts = {'dtype': str, 'keep_default_na': False}
+            with pd.ExcelFile(target_excel) as xls:
+                group_names = [name for name in xls.sheet_names
+                               if name != '전체' and not name.startswith('_')]
+                df_all = xls.parse('전체', **read_opts)
+                results['cross_sheet_validation'] = self.validate_group_sheets(
+                    df_all, ((name, xls.parse(name, **read_opts)) for name in group_names))
+
+        # 결과 저장
+        report_path = Path('validation_report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+        print(f"\n[SUCCESS] 검증 완료! 리포트: {report_path}")
+
+    def validate_group_sheets(self, df_all, group_sheets):
+        """그룹 시트 무결성 검증 (MATNO / WELD ID 기준) - group_sheets: (시트명, DataFrame) 순회"""
         print(f"\n[검증] 시트 간 무결성 체크 (전체 vs 그룹):")
-        for sheet_name in wb.sheetnames:
-            if sheet_name == '전체': continue
-            
-            ws_group = wb[sheet_name]
-            group_data = []
-            for row in ws_group.iter_rows(min_row=2, values_only=True):
-                group_data.append(dict(zip(headers, row)))
-            df_group = pd.DataFrame(group_data)
-            
+        headers = df_all.columns.tolist()
+        validation = {}
+        for sheet_name, df_group in group_sheets:
+            if sheet_name.startswith('_'): continue
+
             # 기준 키 설정 (WELD UNIQUE ID 우선, 없으면 MATNO)
             key_col = 'WELD UNIQUE ID' if 'WELD UNIQUE ID' in df_all.columns else 'MATNO'
-            
+
             # 전체 시트에서 해당 그룹에 속해야 하는 데이터 추출
             # (그룹 시트는 해당 컬럼이 비어있지 않은 데이터만 포함됨)
-            group_col_name = sheet_name.replace('_', ' ') # 시트명에서 컬럼명 복원 시도
             # 정확한 매핑을 위해 headers에서 찾기
             actual_col = next((h for h in headers if h.replace(' ', '_').replace('/', '_')[:31] == sheet_name), None)
-            
+
             if not actual_col:
                 print(f"  [SKIP] {sheet_name}: 매칭되는 컬럼을 찾을 수 없음")
                 continue
 
-            expected_df = df_all[df_all[actual_col].astype(str).str.strip() != ''].copy()
-            
+            expected_df = df_all[df_all[actual_col].astype(str).str.strip() != '']
+
             # 행 수 비교
             count_match = len(df_group) == len(expected_df)
-            
-            # 데이터 일치 여부 (Key 기준 샘플링 체크)
-            data_match = True
-            mismatch_count = 0
-            if count_match and not df_group.empty:
-                # 첫 행, 중간 행, 끝 행 샘플 비교
-                sample_indices = [0, len(df_group)//2, len(df_group)-1]
-                for idx in sample_indices:
-                    row_group = df_group.iloc[idx]
-                    key_val = row_group[key_col]
-                    row_all = df_all[df_all[key_col] == key_val].iloc[0] if not df_all[df_all[key_col] == key_val].empty else None
-                    
-                    if row_all is None:
-                        data_match = False
-                        break
-                    
-                    # 주요 필드 비교 (WEIGHT, T, B 등) - 타입 차이 극복 위해 문자열로 통일
-                    for col in [actual_col, 'WEIGHT', 'T', 'B']:
-                        if col in df_group.columns and col in df_all.columns:
-                            val_group = str(row_group[col]).strip()
-                            val_all = str(row_all[col]).strip()
-                            
-                            # 실수/정수 표현 차이 보정 (예: 10 vs 10.0)
-                            try:
-                                if float(val_group) == float(val_all):
-                                    continue
-                            except:
-                                pass
-
-                            if val_group != val_all:
-                                data_match = False
-                                mismatch_count += 1
+
+            # 데이터 일치 여부 (전수 비교: 그룹 시트의 각 행이 전체 시트에 동일한 값으로 존재하는지)
+            compare_cols = [key_col] + [c for c in df_group.columns if c in df_all.columns and c != key_col]
+            merged = df_group[compare_cols].merge(
+                expected_df[compare_cols].drop_duplicates(), on=compare_cols, how='left', indicator=True
+            )
+            mismatch_count = int((merged['_merge'] != 'both').sum())
+            data_match = mismatch_count == 0
 
             status = "✓ 일치" if (count_match and data_match) else "✗ 불일치"
             print(f"  - {sheet_name:15}: {status} (행 수: {len(df_group)})")
-            
-            results['cross_sheet_validation'][sheet_name] = {
+
+            validation[sheet_name] = {
                 'row_count_match': count_match,
                 'data_match': data_match,
                 'mismatch_count': mismatch_count
             }
-
-        # 결과 저장
-        report_path = Path('validation_report.json')
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-
-        print(f"\n[SUCCESS] 검증 완료! 리포트: {report_path}")
+        return validation
 
     # =====================================================================
     # 메인 메뉴
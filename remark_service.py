@@ -1,8 +1,21 @@
+import atexit
 import http.server
 import json
+import mmap
 import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # orjson 미설치 시 표준 json 사용
+    orjson = None
+
 PORT = 8000
 REMARKS_FILE = Path(__file__).parent / 'remarks.json'
 
@@ -16,6 +29,177 @@ R2_PATH_MAPPING = {
     'assembly-cad': 'balwin2/조립도/REV.2'
 }
 
+# JSON 응답 공통 헤더 (Content-Length 값은 응답마다 붙임)
+_JSON_HEADERS = (b'Access-Control-Allow-Origin: *\r\n'
+                 b'Content-Type: application/json\r\n'
+                 b'Content-Length: ')
+
+# /open 파일 존재 확인 결과 캐시 시간 (초) - 네트워크 드라이브 stat 반복 방지
+EXISTS_TTL = 5
+
+# os.startfile 실행용 워커 (응답은 실행 완료를 기다리지 않음)
+_LAUNCH_POOL = ThreadPoolExecutor(max_workers=4)
+
+# /open 응답 본문 템플릿 (가변 값만 JSON 문자열로 직렬화해 채움)
+_LAUNCHED = b'{"status":"launched","path":%s}'
+_R2_FALLBACK = b'{"status":"r2_fallback","url":%s}'
+_NOT_FOUND = b'{"error":"File not found","path":%s}'
+
+# (폴더, 확장자) -> 파일 타입 (순서대로 검사, 가공도 우선)
+_FILE_TYPES = {
+    ('2. 가공도', '.pdf'): 'fabrication-pdf',
+    ('1. 조립도', '.pdf'): 'assembly-pdf',
+    ('1. 조립도', '.dwg'): 'assembly-cad',
+}
+
+# 파일 타입별 R2 URL prefix (import 시 한 번만 조합)
+_R2_PREFIX = {k: f'{R2_PUBLIC_URL}/{v}/' for k, v in R2_PATH_MAPPING.items() if v}
+
+# %XX -> 바이트 변환표 (대소문자 혼용 포함)
+_HEXDIG = '0123456789ABCDEFabcdef'
+_HEX_TO_BYTE = {(a + b).encode(): bytes.fromhex(a + b) for a in _HEXDIG for b in _HEXDIG}
+
+# remarks.json 메모리 캐시 (mtime 변경 시에만 다시 파싱)
+# 요청이 여러 스레드에서 처리되므로 캐시/파일 쓰기는 RLock으로 보호
+_CACHE = {'mtime': -1, 'data': {}, 'dirty': False}
+_CACHE_LOCK = threading.RLock()
+
+# 연속 저장은 모아서 한 번만 기록 (마지막 저장 후 FLUSH_DELAY초 뒤)
+FLUSH_DELAY = 0.2
+_flush_timer = None
+
+
+if orjson:
+    def _dumps(obj):
+        return orjson.dumps(obj)
+
+    def _dumps_pretty(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj).encode()
+
+    def _dumps_pretty(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+    def _loads(data):
+        # 표준 json은 memoryview를 받지 않으므로 bytes로 변환
+        return json.loads(bytes(data))
+
+
+def _load_remarks():
+    """
+    remarks.json 로드 (파일 mtime이 같으면 캐시 재사용)
+
+    Returns:
+        비고 dict
+    """
+    with _CACHE_LOCK:
+        # 아직 기록되지 않은 변경이 있으면 메모리가 최신
+        if _CACHE['dirty']:
+            return _CACHE['data']
+
+        try:
+            st = os.stat(REMARKS_FILE)
+        except FileNotFoundError:
+            return {}
+
+        mtime = st.st_mtime_ns
+        if mtime != _CACHE['mtime']:
+            data = {}
+            # 빈 파일은 mmap 불가 -> 그대로 {}
+            if st.st_size:
+                try:
+                    # 파일을 메모리에 매핑해 복사 없이 바로 파싱
+                    with open(REMARKS_FILE, 'rb') as f, \
+                            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                            memoryview(mm) as view:
+                        data = _loads(view)
+                except ValueError as e:  # JSONDecodeError / UnicodeDecodeError
+                    # 손상된 파일은 따로 보관 (다음 저장이 덮어써 기존 비고가 사라지지 않도록)
+                    bad = REMARKS_FILE.with_name(f'{REMARKS_FILE.name}.bad-{int(time.time())}')
+                    os.replace(REMARKS_FILE, bad)
+                    print(f"[WARN] remarks.json 파싱 실패: {e} -> {bad.name} 로 보관")
+            _CACHE['mtime'] = mtime
+            _CACHE['data'] = data
+        return _CACHE['data']
+
+
+def _flush():
+    """대기 중인 비고를 remarks.json에 기록 (임시 파일에 쓰고 교체)"""
+    with _CACHE_LOCK:
+        if not _CACHE['dirty']:
+            return
+        buf = _dumps_pretty(_CACHE['data'])
+
+        # 쓰기 중 중단되어도 기존 파일 유지
+        tmp = REMARKS_FILE.with_suffix('.json.tmp')
+        tmp.write_bytes(buf)
+        os.replace(tmp, REMARKS_FILE)
+        _CACHE['mtime'] = os.stat(REMARKS_FILE).st_mtime_ns
+        _CACHE['dirty'] = False
+
+
+def _schedule_flush():
+    """기록 타이머 재설정 (저장이 이어지면 계속 뒤로 미룸)"""
+    global _flush_timer
+    with _CACHE_LOCK:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+        _flush_timer = threading.Timer(FLUSH_DELAY, _flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+# 종료 시 대기 중인 변경 기록
+atexit.register(_flush)
+
+
+def _unquote(s):
+    """
+    URL 퍼센트 인코딩 해제 (urllib.parse.unquote와 동일 결과)
+
+    Args:
+        s: 인코딩된 문자열
+
+    Returns:
+        디코딩된 문자열
+    """
+    if '%' not in s:
+        return s
+    parts = s.encode('utf-8').split(b'%')
+    out = [parts[0]]
+    append = out.append
+    for part in parts[1:]:
+        byte = _HEX_TO_BYTE.get(part[:2])
+        append(byte + part[2:] if byte else b'%' + part)
+    return b''.join(out).decode('utf-8', 'replace')
+
+
+@lru_cache(maxsize=4096)
+def _cached_exists(path, bucket):
+    """
+    파일 존재 여부 (bucket 값이 바뀌면 다시 확인)
+
+    Args:
+        path: 로컬 파일 경로
+        bucket: TTL 구간 번호 (time.monotonic() // EXISTS_TTL)
+
+    Returns:
+        존재 여부
+    """
+    return os.path.exists(path)
+
+
+def _launch(path):
+    """시스템 뷰어로 파일 열기 (워커 스레드에서 실행, 실패는 로그로 남김)"""
+    try:
+        os.startfile(path)
+    except Exception as e:
+        print(f"[LAUNCH ERROR] {path}: {e}")
+
 
 def build_r2_url(local_path):
     """
@@ -27,60 +211,68 @@ def build_r2_url(local_path):
     Returns:
         R2 URL 또는 None
     """
-    # 파일 타입 감지
-    path_lower = local_path.lower()
-    if '2. 가공도' in path_lower and '.pdf' in path_lower:
-        file_type = 'fabrication-pdf'
-    elif '1. 조립도' in path_lower:
-        if '.pdf' in path_lower:
-            file_type = 'assembly-pdf'
-        elif '.dwg' in path_lower:
-            file_type = 'assembly-cad'
-    else:
-        return None
-
-    # 파일명 추출
-    filename = os.path.basename(local_path)
-
-    # R2 경로 가져오기
-    r2_path = R2_PATH_MAPPING.get(file_type, '')
-    if not r2_path:
-        return None
-
-    # R2 URL 생성
-    r2_url = f'{R2_PUBLIC_URL}/{r2_path}/{filename}'
-    return r2_url
+    # 파일 타입 감지 - 확장자를 먼저 비교하고 해당 폴더명만 검색
+    ext = os.path.splitext(local_path)[1].lower()
+    for (folder, type_ext), file_type in _FILE_TYPES.items():
+        if type_ext == ext and folder in local_path:
+            # R2 URL 생성 (prefix + 파일명)
+            prefix = _R2_PREFIX.get(file_type)
+            filename = local_path.rsplit('/', 1)[-1].rsplit('\\', 1)[-1]
+            return prefix + filename if prefix else None
+    return None
 
 
 class RemarkHandler(http.server.BaseHTTPRequestHandler):
+    # 같은 연결로 여러 요청 처리 (모든 응답에 Content-Length 필요)
+    protocol_version = 'HTTP/1.1'
+    # 작은 JSON 응답이 Nagle 지연(최대 ~40ms)에 걸리지 않도록 TCP_NODELAY
+    disable_nagle_algorithm = True
+    # 유휴 keep-alive 연결이 스레드를 계속 잡고 있지 않도록
+    timeout = 60
+
+    def _json(self, status, obj):
+        """JSON 응답 전송"""
+        self._reply(status, _dumps(obj))
+
+    def _reply(self, status, body):
+        """직렬화된 JSON 본문 전송 (상태줄/헤더/본문을 한 번에 기록)"""
+        self.log_request(status)
+        self.wfile.write(b'%s %d %s\r\n%s%d\r\n\r\n%s' % (
+            self.protocol_version.encode(), status, self.responses[status][0].encode(),
+            _JSON_HEADERS, len(body), body))
+
+    def _read_json(self):
+        """요청 본문을 미리 할당한 버퍼에 읽어 바로 JSON 파싱 (중간 bytes 복사 없음)"""
+        length = int(self.headers['Content-Length'])
+        buf = bytearray(length)
+        view = memoryview(buf)
+        n = 0
+        while n < length:
+            got = self.rfile.readinto(view[n:])
+            if not got:
+                break
+            n += got
+        view.release()
+        del buf[n:]
+        return _loads(buf)
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
     def do_GET(self):
         if self.path == '/remarks':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-
-            data = {}
-            if REMARKS_FILE.exists():
-                with open(REMARKS_FILE, 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                    except:
-                        pass
-            self.wfile.write(json.dumps(data).encode())
+            self._json(200, _load_remarks())
+        else:
+            self.send_error(404)
 
     def do_POST(self):
         if self.path == '/save':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            payload = json.loads(post_data.decode('utf-8'))
+            payload = self._read_json()
 
             uid = payload.get('uid')
             remark = payload.get('remark')
@@ -89,31 +281,20 @@ class RemarkHandler(http.server.BaseHTTPRequestHandler):
                 self.send_error(400, "Missing UID")
                 return
 
-            # Load existing
-            data = {}
-            if REMARKS_FILE.exists():
-                with open(REMARKS_FILE, 'r', encoding='utf-8') as f:
-                    try:
-                        data = json.load(f)
-                    except:
-                        pass
+            with _CACHE_LOCK:
+                # Load existing (GET이 직렬화 중인 dict는 건드리지 않도록 복사)
+                data = dict(_load_remarks())
 
-            # Update
-            data[uid] = remark
+                # Update - 메모리에 반영 후 디스크 기록은 타이머로 모아서 처리
+                data[uid] = remark
+                _CACHE['data'] = data
+                _CACHE['dirty'] = True
+                _schedule_flush()
 
-            with open(REMARKS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-
-            self.send_response(200)
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "success"}).encode())
+            self._json(200, {"status": "queued"})
 
         elif self.path == '/open':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            payload = json.loads(post_data.decode('utf-8'))
+            payload = self._read_json()
 
             file_path = payload.get('path', '')
             if file_path:
@@ -123,61 +304,52 @@ class RemarkHandler(http.server.BaseHTTPRequestHandler):
                     local_path = file_path.replace('file:///', '')
 
                     # 2. URL Decode everything (handles spaces, Korean characters, etc.)
-                    import urllib.parse
-                    local_path = urllib.parse.unquote(local_path)
+                    local_path = _unquote(local_path)
 
                     # 3. On Windows, ensure it starts correctly (remove leading slash if it exists after file:///)
                     if os.name == 'nt' and local_path.startswith('/') and local_path[2] == ':':
                         local_path = local_path[1:]
 
-                    # 4. Normalize separators
-                    local_path = os.path.normpath(local_path)
+                    # 4. Normalize separators (.. / 중복 구분자 / 대체 구분자가 있을 때만)
+                    if '..' in local_path or '//' in local_path or (os.altsep and os.altsep in local_path):
+                        local_path = os.path.normpath(local_path)
 
                     print(f"[OPEN REQUEST] Raw: {file_path}")
                     print(f"[OPEN REQUEST] Normalized: {local_path}")
 
-                    if os.path.exists(local_path):
+                    if _cached_exists(local_path, int(time.monotonic() // EXISTS_TTL)):
                         # 로컬 파일 있으면 시스템 뷰어로 열림
                         print(f"Executing: os.startfile('{local_path}')")
-                        os.startfile(local_path)
+                        _LAUNCH_POOL.submit(_launch, local_path)
 
-                        self.send_response(200)
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.send_header('Content-type', 'application/json')
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"status": "launched", "path": local_path}).encode())
+                        self._reply(200, _LAUNCHED % _dumps(local_path))
                     else:
                         # R2 Fallback - 로컬 파일 없으면 R2 URL 반환
                         r2_url = build_r2_url(local_path)
 
                         if r2_url:
                             print(f"[R2 FALLBACK] Using R2 URL: {r2_url}")
-                            self.send_response(200)
-                            self.send_header('Access-Control-Allow-Origin', '*')
-                            self.send_header('Content-type', 'application/json')
-                            self.end_headers()
-                            self.wfile.write(json.dumps({"status": "r2_fallback", "url": r2_url}).encode())
+                            self._reply(200, _R2_FALLBACK % _dumps(r2_url))
                             return
 
                         print(f"[ERROR] File not found: {local_path}")
-                        self.send_response(404)
-                        self.send_header('Access-Control-Allow-Origin', '*')
-                        self.send_header('Content-type', 'application/json')
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "File not found", "path": local_path}).encode())
+                        self._reply(404, _NOT_FOUND % _dumps(local_path))
                 except Exception as e:
                     print(f"[CRITICAL ERROR] {str(e)}")
-                    self.send_response(500)
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": str(e)}).encode())
+                    self._json(500, {"error": str(e)})
             else:
                 self.send_error(400, "Missing path")
 
+        else:
+            self.send_error(404)
+
 if __name__ == "__main__":
     print(f"--- Remark Service started on http://localhost:{PORT} ---")
     print(f"R2 Public URL: {R2_PUBLIC_URL}")
     print(f"Target file: {REMARKS_FILE}")
     print("Press Ctrl+C to stop.")
-    server = http.server.HTTPServer(('localhost', PORT), RemarkHandler)
+    # SIGTERM도 정상 종료로 처리해 atexit 기록이 실행되도록 함
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = http.server.ThreadingHTTPServer(('localhost', PORT), RemarkHandler)
+    server.daemon_threads = True
     server.serve_forever()